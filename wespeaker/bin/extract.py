@@ -25,6 +25,7 @@ from tqdm import tqdm
 from wespeaker.dataset.dataset import Dataset
 from wespeaker.dataset.dataset_utils import apply_cmvn, spec_aug
 from wespeaker.frontend import *
+from wespeaker.models.pooling_layers import compile_pooling
 from wespeaker.models.speaker_model import get_speaker_model
 from wespeaker.utils.checkpoint import load_checkpoint
 from wespeaker.utils.utils import parse_config_or_kwargs, validate_path
@@ -58,6 +59,14 @@ def extract(config='conf/config.yaml', **kwargs):
     print('Finished !!! Start extracting ...')
     device = torch.device("cuda")
     model.to(device).eval()
+    # The compiled pooling is specialized on the input shape, only use it
+    # when extracting on fixed-length chunks
+    if configs.get('compile_pooling', False):
+        if batch_size > 1:
+            compile_pooling(model)
+        else:
+            print('compile_pooling is ignored for batch_size == 1 '
+                  '(whole utterances), extracting with eager pooling')
 
     # test_configs
     # test_conf = copy.deepcopy(configs['dataset_args'])
@@ -110,10 +119,16 @@ def extract(config='conf/config.yaml', **kwargs):
                 if test_conf.get('spec_aug', False):
                     features = spec_aug(features, **test_conf['spec_aug_args'])
 
-                # Forward through model
-                outputs = model(features)  # embed or (embed_a, embed_b)
+                # Forward through model, with extract_amp the frame-level
+                # layers run in half precision while the pooling layers
+                # keep their statistics in float32. This is a separate
+                # opt-in: the training-time enable_amp saved in the exp's
+                # config.yaml must not change the extracted embeddings
+                with torch.cuda.amp.autocast(
+                        enabled=configs.get('extract_amp', False)):
+                    outputs = model(features)  # embed or (embed_a, embed_b)
                 embeds = outputs[-1] if isinstance(outputs, tuple) else outputs
-                embeds = embeds.cpu().detach().numpy()  # (B,F)
+                embeds = embeds.float().cpu().detach().numpy()  # (B,F)
 
                 for i, utt in enumerate(utts):
                     embed = embeds[i]
@@ -24,7 +24,123 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 
-class TAP(nn.Module):
+try:
+    # torch >= 2.4 takes the device type, is_autocast_cpu_enabled() is
+    # deprecated from then on
+    torch.is_autocast_enabled('cpu')
+
+    def _is_autocast_cpu_enabled():
+        return torch.is_autocast_enabled('cpu')
+except TypeError:
+    _is_autocast_cpu_enabled = torch.is_autocast_cpu_enabled
+
+
+def _can_contract(alpha, x):
+    """
+    Whether the weighted sums over time may use einsum. einsum is lowered
+    to bmm, which autocast (CUDA or CPU) runs in half precision, and it
+    materializes x when x is broadcast over several sets of weights (e.g.
+    the queries of MQMHASTP). torch.is_autocast_enabled() only reports
+    CUDA autocast and the CPU flag cannot be read from TorchScript, so
+    scripted models always take the plain sums.
+    """
+    if torch.jit.is_scripting():
+        return False
+    else:
+        if alpha.numel() > x.numel():
+            return False
+        return not (torch.is_autocast_enabled()
+                    or _is_autocast_cpu_enabled())
+
+
+def _weighted_mean(alpha, x):
+    """
+    Mean of x along the last (temporal) axis weighted by alpha, see
+    _weighted_stats below.
+    """
+    alpha = alpha.float()
+    x = x.float()
+    if not _can_contract(alpha, x):
+        return torch.sum(alpha * x, dim=-1)
+    return torch.einsum('...t,...t->...', alpha, x)
+
+
+def _weighted_stats(alpha, x):
+    """
+    Mean and variance of x along the last (temporal) axis, weighted by the
+    normalized attention weights alpha. After a first pass for the shift
+    below, both moments are einsum contractions over the frames, or plain
+    sums over alpha * x where _can_contract rules einsum out.
+
+    The statistics are always accumulated in float32: under autocast the
+    attention layers producing alpha (and the frames themselves) run in
+    half precision, but E[x^2] - E[x]^2 does not survive it. The frames
+    are also shifted by their plain temporal mean c first, which leaves
+    the variance unchanged, Var = E[(x-c)^2] - (E[x]-c)^2, but keeps both
+    terms small when the mean is large compared to the spread.
+    """
+    alpha = alpha.float()
+    x = x.float()
+    shift = x.mean(dim=-1, keepdim=True)
+    x = x - shift
+    if not _can_contract(alpha, x):
+        weighted_x = alpha * x
+        mean = torch.sum(weighted_x, dim=-1)
+        var = torch.sum(weighted_x * x, dim=-1) - mean**2
+    else:
+        # Contract the weights with the frames instead of summing
+        # alpha * x, so the weighted frames are never written out before
+        # the reduction
+        mean = torch.einsum('...t,...t->...', alpha, x)
+        var = torch.einsum('...t,...t->...', alpha, x * x) - mean**2
+    return mean + shift.squeeze(-1), var
+
+
+def _safe_std(var, eps):
+    """
+    Standard deviation from a variance computed as a difference of
+    moments, E[(x-c)^2] - (E[x]-c)^2 in _weighted_stats, which can still
+    come out slightly negative (or zero) through cancellation; the clamp
+    keeps both the sqrt and its gradient finite. eps is the calling
+    layer's (0-dim) _eps buffer.
+    """
+    return torch.sqrt(var.clamp_min(eps))
+
+
+def _attentive_stats(alpha_logits, x):
+    """
+    Attention weighted mean and variance of x along the last (temporal)
+    axis, where the weights are the softmax of alpha_logits over the same
+    axis. Shared by all the attentive pooling layers below.
+    """
+    alpha = F.softmax(alpha_logits.float(), dim=-1)
+    return _weighted_stats(alpha, x)
+
+
+class _Pooling(nn.Module):
+    """
+    Common base of the pooling layers below
+    """
+
+    @torch.inference_mode()
+    def forward_embedding(self, frames, mask=None):
+        """
+        Inference-only pooling of a batch of chunks, e.g. the sliding
+        windows of diarization, stacked as frames: (N, ..., T).
+
+        mask: optional bool tensor (N,), chunks marked False (silence,
+            inactive speakers) are not run through the layer at all and
+            get all-zero statistics
+        """
+        if mask is None:
+            return self(frames)
+        stats = self(frames[mask])
+        out = stats.new_zeros((frames.shape[0], ) + stats.shape[1:])
+        out[mask] = stats
+        return out
+
+
+class TAP(_Pooling):
     """
     Temporal average pooling, only first-order mean is considered
     """
@@ -34,6 +150,8 @@ class TAP(nn.Module):
         self.in_dim = in_dim
 
     def forward(self, x):
+        # Pool in float32, also when the frames come from autocast
+        x = x.float()
         pooling_mean = x.mean(dim=-1)
         # To be compatable with 2D input
         pooling_mean = pooling_mean.flatten(start_dim=1)
@@ -44,7 +162,7 @@ class TAP(nn.Module):
         return self.out_dim
 
 
-class TSDP(nn.Module):
+class TSDP(_Pooling):
     """
     Temporal standard deviation pooling, only second-order std is considered
     """
@@ -52,10 +170,15 @@ class TSDP(nn.Module):
     def __init__(self, in_dim=0, **kwargs):
         super(TSDP, self).__init__()
         self.in_dim = in_dim
+        # Kept as a (non-persistent) buffer so that forward does not pass
+        # a Python scalar to the kernels on every call
+        self.register_buffer('_eps', torch.tensor(1e-7), persistent=False)
 
     def forward(self, x):
         # The last dimension is the temporal axis
-        pooling_std = torch.sqrt(torch.var(x, dim=-1) + 1e-7)
+        # Pool in float32, also when the frames come from autocast
+        x = x.float()
+        pooling_std = torch.sqrt(torch.var(x, dim=-1) + self._eps)
         pooling_std = pooling_std.flatten(start_dim=1)
         return pooling_std
 
@@ -64,7 +187,7 @@ class TSDP(nn.Module):
         return self.out_dim
 
 
-class TSTP(nn.Module):
+class TSTP(_Pooling):
     """
     Temporal statistics pooling, concatenate mean and std, which is used in
     x-vector
@@ -74,11 +197,15 @@ class TSTP(nn.Module):
     def __init__(self, in_dim=0, **kwargs):
         super(TSTP, self).__init__()
         self.in_dim = in_dim
+        self.register_buffer('_eps', torch.tensor(1e-7), persistent=False)
 
     def forward(self, x):
         # The last dimension is the temporal axis
-        pooling_mean = x.mean(dim=-1)
-        pooling_std = torch.sqrt(torch.var(x, dim=-1) + 1e-7)
+        # Pool in float32, also when the frames come from autocast
+        x = x.float()
+        # var_mean computes both statistics in a single reduction
+        pooling_var, pooling_mean = torch.var_mean(x, dim=-1)
+        pooling_std = torch.sqrt(pooling_var + self._eps)
         pooling_mean = pooling_mean.flatten(start_dim=1)
         pooling_std = pooling_std.flatten(start_dim=1)
         stats = torch.cat((pooling_mean, pooling_std), 1)
@@ -89,7 +216,7 @@ class TSTP(nn.Module):
         return self.out_dim
 
 
-class ASTP(nn.Module):
+class ASTP(_Pooling):
     """ Attentive statistics pooling: Channel- and context-dependent
         statistics pooling, first used in ECAPA_TDNN.
     """
@@ -115,6 +242,7 @@ class ASTP(nn.Module):
                 kernel_size=1)  # equals W and b in the paper
         self.linear2 = nn.Conv1d(bottleneck_dim, in_dim,
                                  kernel_size=1)  # equals V and k in the paper
+        self.register_buffer('_eps', torch.tensor(1e-7), persistent=False)
 
     def forward(self, x):
         """
@@ -122,25 +250,29 @@ class ASTP(nn.Module):
             or a 4-dimensional tensor in resnet architecture (B,C,F,T)
             0-dim: batch-dimension, last-dim: time-dimension (frame-dimension)
         """
-        if len(x.shape) == 4:
-            x = x.reshape(x.shape[0], x.shape[1] * x.shape[2], x.shape[3])
-        assert len(x.shape) == 3
+        # (B, C, F, T) -> (B, C * F, T), a no-op for (B, F, T) inputs
+        x = x.flatten(start_dim=1, end_dim=-2)
 
         if self.global_context_att:
-            context_mean = torch.mean(x, dim=-1, keepdim=True).expand_as(x)
-            context_std = torch.sqrt(
-                torch.var(x, dim=-1, keepdim=True) + 1e-7).expand_as(x)
-            x_in = torch.cat((x, context_mean, context_std), dim=1)
+            context_var, context_mean = torch.var_mean(x,
+                                                       dim=-1,
+                                                       keepdim=True)
+            context_std = torch.sqrt(context_var + self._eps)
+            # linear1 sees cat(x, mean, std) along the channels. The
+            # context columns are constant over time, so rather than
+            # expanding them to (B, 2F, T) we split the weight and apply
+            # the context part once per utterance, broadcasting over T.
+            weight = self.linear1.weight
+            context = torch.cat((context_mean, context_std), dim=1)
+            x_in = F.conv1d(x, weight[:, :self.in_dim]) + F.conv1d(
+                context, weight[:, self.in_dim:], self.linear1.bias)
         else:
-            x_in = x
+            x_in = self.linear1(x)
 
         # DON'T use ReLU here! ReLU may be hard to converge.
-        alpha = torch.tanh(
-            self.linear1(x_in))  # alpha = F.relu(self.linear1(x_in))
-        alpha = torch.softmax(self.linear2(alpha), dim=2)
-        mean = torch.sum(alpha * x, dim=2)
-        var = torch.sum(alpha * (x**2), dim=2) - mean**2
-        std = torch.sqrt(var.clamp(min=1e-7))
+        alpha = torch.tanh(x_in)  # alpha = F.relu(self.linear1(x_in))
+        mean, var = _attentive_stats(self.linear2(alpha), x)
+        std = _safe_std(var, self._eps)
         return torch.cat([mean, std], dim=1)
 
     def get_out_dim(self):
@@ -148,32 +280,33 @@ class ASTP(nn.Module):
         return self.out_dim
 
 
-class ASP(nn.Module):
+class ASP(_Pooling):
     # Attentive statistics pooling
     def __init__(self, in_planes, acoustic_dim):
         super(ASP, self).__init__()
         outmap_size = int(acoustic_dim / 8)
         self.out_dim = in_planes * 8 * outmap_size * 2
 
+        # Produces the attention logits, the softmax over time is taken
+        # together with the statistics in _attentive_stats
         self.attention = nn.Sequential(
             nn.Conv1d(in_planes * 8 * outmap_size, 128, kernel_size=1),
             nn.ReLU(),
             nn.BatchNorm1d(128),
             nn.Conv1d(128, in_planes * 8 * outmap_size, kernel_size=1),
-            nn.Softmax(dim=2),
         )
+        self.register_buffer('_eps', torch.tensor(1e-5), persistent=False)
 
     def forward(self, x):
-        x = x.reshape(x.size()[0], -1, x.size()[-1])
-        w = self.attention(x)
-        mu = torch.sum(x * w, dim=2)
-        sg = torch.sqrt((torch.sum((x**2) * w, dim=2) - mu**2).clamp(min=1e-5))
+        x = x.flatten(start_dim=1, end_dim=-2)
+        mu, var = _attentive_stats(self.attention(x), x)
+        sg = _safe_std(var, self._eps)
         x = torch.cat((mu, sg), 1)
-        x = x.view(x.size()[0], -1)
+        x = x.flatten(start_dim=1)
         return x
 
 
-class MHASTP(torch.nn.Module):
+class MHASTP(_Pooling):
     """ Multi head attentive statistics pooling
     Reference:
         Self Multi-Head Attention for Speaker Recognition
@@ -186,12 +319,14 @@ class MHASTP(torch.nn.Module):
                  head_num=2,
                  d_s=1,
                  bottleneck_dim=64,
+                 query_num=1,
                  **kwargs):
         super(MHASTP, self).__init__()
         assert (in_dim % head_num
                 ) == 0  # make sure that head num can be divided by input_dim
         self.in_dim = in_dim
         self.head_num = head_num
+        self.query_num = query_num
         d_model = int(in_dim / head_num)
         channel_dims = [bottleneck_dim for i in range(layer_num + 1)]
         if d_s > 1:
@@ -200,20 +335,54 @@ class MHASTP(torch.nn.Module):
             d_s = 1
         self.d_s = d_s
         channel_dims[0], channel_dims[-1] = d_model, d_s
-        heads_att_trans = []
-        for i in range(self.head_num):
-            att_trans = nn.Sequential()
-            for i in range(layer_num - 1):
-                att_trans.add_module(
-                    'att_' + str(i),
-                    nn.Conv1d(channel_dims[i], channel_dims[i + 1], 1, 1))
-                att_trans.add_module('tanh' + str(i), nn.Tanh())
+        self.register_buffer('_eps', torch.tensor(1e-7), persistent=False)
+        # All heads and queries share one Sequential of grouped
+        # convolutions, laid out as (head, query, channel): the first
+        # layer maps each head's input to all of its queries, the later
+        # layers keep every (head, query) pair in its own group
+        att_trans = nn.Sequential()
+        for i in range(layer_num):
+            if i == 0:
+                in_channels, groups = head_num * channel_dims[0], head_num
+            else:
+                in_channels = head_num * query_num * channel_dims[i]
+                groups = head_num * query_num
             att_trans.add_module(
-                'att_' + str(layer_num - 1),
-                nn.Conv1d(channel_dims[layer_num - 1], channel_dims[layer_num],
-                          1, 1))
-            heads_att_trans.append(att_trans)
-        self.heads_att_trans = nn.ModuleList(heads_att_trans)
+                'att_' + str(i),
+                nn.Conv1d(in_channels,
+                          head_num * query_num * channel_dims[i + 1],
+                          1,
+                          1,
+                          groups=groups))
+            if i < layer_num - 1:
+                att_trans.add_module('tanh' + str(i), nn.Tanh())
+        self.att_trans = att_trans
+
+    def _legacy_head_prefix(self, prefix, query, head):
+        return '{}heads_att_trans.{}.'.format(prefix, head)
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # Checkpoints saved before the heads were merged store one
+        # Sequential per head (and per query), stack them along the output
+        # channels to match the grouped convolutions
+        for name, module in self.att_trans.named_children():
+            if not isinstance(module, nn.Conv1d):
+                continue
+            for param in ('weight', 'bias'):
+                # A plain MHASTP maps every query to the same per-head key,
+                # keep each key once so that a checkpoint with the wrong
+                # query_num ends in a size mismatch rather than a KeyError
+                old_keys = list(
+                    dict.fromkeys(
+                        self._legacy_head_prefix(prefix, q, h) + name + '.' +
+                        param for h in range(self.head_num)
+                        for q in range(self.query_num)))
+                if all(key in state_dict for key in old_keys):
+                    state_dict['{}att_trans.{}.{}'.format(
+                        prefix, name, param)] = torch.cat(
+                            [state_dict.pop(key) for key in old_keys], dim=0)
+        super(MHASTP, self)._load_from_state_dict(state_dict, prefix, *args,
+                                                  **kwargs)
 
     def forward(self, input):
         """
@@ -221,33 +390,28 @@ class MHASTP(torch.nn.Module):
             or a 4-dimensional tensor in resnet architecture
             0-dim: batch-dimension, last-dim: time-dimension (frame-dimension)
         """
-        if len(input.shape) == 4:  # B x F x T
-            input = input.reshape(input.shape[0],
-                                  input.shape[1] * input.shape[2],
-                                  input.shape[3])
-        assert len(input.shape) == 3
+        # (B, C, F, T) -> (B, C * F, T), a no-op for (B, F, T) inputs
+        input = input.flatten(start_dim=1, end_dim=-2)
         bs, f_dim, t_dim = input.shape
-        chunks = torch.chunk(input, self.head_num, 1)
-        # split
-        chunks_out = []
-        # for i in range(self.head_num):
-        #     att_score = self.heads_att_trans[i](chunks[i])
-        for i, layer in enumerate(self.heads_att_trans):
-            att_score = layer(chunks[i])
-            alpha = F.softmax(att_score, dim=-1)
-            mean = torch.sum(alpha * chunks[i], dim=2)
-            var = torch.sum(alpha * chunks[i]**2, dim=2) - mean**2
-            std = torch.sqrt(var.clamp(min=1e-7))
-            chunks_out.append(torch.cat((mean, std), dim=1))
-        out = torch.cat(chunks_out, dim=1)
+        att_score = self.att_trans(input)
+        # split into heads and queries: (B, H, 1, d_model, T) for the
+        # input, which is shared by all queries, and (B, H, Q, d_s, T)
+        input = input.reshape(bs, self.head_num, 1, f_dim // self.head_num,
+                              t_dim)
+        att_score = att_score.reshape(bs, self.head_num, self.query_num,
+                                      self.d_s, t_dim)
+        mean, var = _attentive_stats(att_score, input)
+        std = _safe_std(var, self._eps)
+        # output order: queries, then heads, then (mean, std) of each head
+        out = torch.cat((mean, std), dim=3).transpose(1, 2).flatten(1)
         return out
 
     def get_out_dim(self):
-        self.out_dim = 2 * self.in_dim
+        self.out_dim = 2 * self.in_dim * self.query_num
         return self.out_dim
 
 
-class MQMHASTP(torch.nn.Module):
+class MQMHASTP(MHASTP):
     """ An attentive pooling
     Reference:
         multi query multi head attentive statistics pooling
@@ -267,6 +431,9 @@ class MQMHASTP(torch.nn.Module):
         https://arxiv.org/pdf/1803.10963.pdf
     VSA (H = 1, Q > 1, n = 2, d_s = d_h) ref:
         http://www.interspeech2020.org/uploadfile/pdf/Mon-2-10-5.pdf
+
+    All queries are computed by a single MHASTP with query_num queries,
+    rather than by query_num separate MHASTP modules.
     """
 
     def __init__(self,
@@ -277,40 +444,19 @@ class MQMHASTP(torch.nn.Module):
                  d_s=2,
                  bottleneck_dim=64,
                  **kwargs):
-        super(MQMHASTP, self).__init__()
-        self.n_query = nn.ModuleList([
-            MHASTP(in_dim,
-                   layer_num=layer_num,
-                   head_num=head_num,
-                   d_s=d_s,
-                   bottleneck_dim=bottleneck_dim) for i in range(query_num)
-        ])
-        self.query_num = query_num
-        self.in_dim = in_dim
-
-    def forward(self, input):
-        """
-        input: a 3-dimensional tensor in xvector architecture
-            or a 4-dimensional tensor in resnet architecture
-            0-dim: batch-dimension, last-dim: time-dimension (frame-dimension)
-        """
-        if len(input.shape) == 4:  # B x F x T
-            input = input.reshape(input.shape[0],
-                                  input.shape[1] * input.shape[2],
-                                  input.shape[3])
-        assert len(input.shape) == 3
-        res = []
-        for i, layer in enumerate(self.n_query):
-            res.append(layer(input))
-        out = torch.cat(res, dim=-1)
-        return out
+        super(MQMHASTP, self).__init__(in_dim,
+                                       layer_num=layer_num,
+                                       head_num=head_num,
+                                       d_s=d_s,
+                                       bottleneck_dim=bottleneck_dim,
+                                       query_num=query_num)
 
-    def get_out_dim(self):
-        self.out_dim = self.in_dim * 2 * self.query_num
-        return self.out_dim
+    def _legacy_head_prefix(self, prefix, query, head):
+        # used to be a ModuleList of query_num MHASTP modules
+        return '{}n_query.{}.heads_att_trans.{}.'.format(prefix, query, head)
 
 
-class XI(torch.nn.Module):
+class XI(_Pooling):
     def __init__(self, in_dim, hidden_size=256, stddev=False,
                  train_mean=True, train_prec=True, **kwargs):
         super(XI, self).__init__()
@@ -320,10 +466,12 @@ class XI(torch.nn.Module):
             self.output_dim = 2 * self.input_dim
         else:
             self.output_dim = self.input_dim
-        self.prior_mean = torch.nn.Parameter(torch.zeros(1, self.input_dim),
-                                             requires_grad=train_mean)
-        self.prior_logprec = torch.nn.Parameter(torch.zeros(1, self.input_dim),
-                                                requires_grad=train_prec)
+        # Stored as (1, D, 1), i.e. as a single frame, so that forward can
+        # append them to the frames with a plain expand
+        self.prior_mean = torch.nn.Parameter(
+            torch.zeros(1, self.input_dim, 1), requires_grad=train_mean)
+        self.prior_logprec = torch.nn.Parameter(
+            torch.zeros(1, self.input_dim, 1), requires_grad=train_prec)
         self.softmax = torch.nn.Softmax(dim=2)
 
         # Log-precision estimator
@@ -335,6 +483,16 @@ class XI(torch.nn.Module):
         self.lin2 = nn.Conv1d(hidden_size, self.input_dim, kernel_size=1,
                               stride=1, bias=True)
         self.softplus2 = torch.nn.Softplus(beta=1, threshold=20)
+        self.register_buffer('_eps', torch.tensor(1.0e-12), persistent=False)
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # Older checkpoints store the priors as (1, D)
+        for name in ('prior_mean', 'prior_logprec'):
+            key = prefix + name
+            if key in state_dict and state_dict[key].dim() == 2:
+                state_dict[key] = state_dict[key].unsqueeze(2)
+        super(XI, self)._load_from_state_dict(state_dict, prefix, *args,
+                                              **kwargs)
 
     def forward(self, inputs):
         """
@@ -352,34 +510,56 @@ class XI(torch.nn.Module):
         logprec = 2.0 * torch.log(logprec)
         # Gaussian Posterior Inference
         # Option 1: a_o (prior_mean-phi) included in variance
-        weight_attn = self.softmax(
-            torch.cat(
-                (logprec,
-                 self.prior_logprec.repeat(
-                     logprec.shape[0], 1).unsqueeze(dim=2)), 2))
-        # Posterior precision
-        Ls = torch.sum(torch.exp(torch.cat(
-            (logprec, self.prior_logprec.repeat(
-                logprec.shape[0], 1).unsqueeze(dim=2)), 2)), dim=2)
-        # Posterior mean
-        phi = torch.sum(torch.cat(
-            (feat, self.prior_mean.repeat(
-                feat.shape[0], 1).unsqueeze(dim=2)), 2) * weight_attn, dim=2)
+        # The prior enters as one extra frame appended to every sample,
+        # expand (rather than repeat) it and build the concatenations once
+        batch_size = feat.shape[0]
+        logprec = torch.cat(
+            (logprec, self.prior_logprec.expand(batch_size, -1, -1)), 2)
+        feat = torch.cat((feat, self.prior_mean.expand(batch_size, -1, -1)),
+                         2)
+        # The posterior precision, Ls = sum(exp(logprec)), only normalizes
+        # the attention weights below and is not part of the output, so it
+        # is not computed separately; the softmax already does that sum
 
         if self.stddev:
-            sigma2 = torch.sum(torch.cat((
-                feat, self.prior_mean.repeat(
-                    feat.shape[0], 1).unsqueeze(dim=2)), 2).pow(2) * weight_attn, dim=2)
-            sigma = torch.sqrt(torch.clamp(sigma2 - phi ** 2, min=1.0e-12))
+            # Posterior mean and variance
+            phi, sigma2 = _attentive_stats(logprec, feat)
+            sigma = _safe_std(sigma2, self._eps)
             return torch.cat((phi, sigma), dim=1).unsqueeze(dim=2)
-        else:
-            return phi
+
+        weight_attn = self.softmax(logprec)
+        # Posterior mean
+        phi = _weighted_mean(weight_attn, feat)
+        return phi
 
     def get_out_dim(self):
         return self.output_dim
 
     def get_prior(self):
-        return self.prior_mean, self.prior_logprec
+        return self.prior_mean.squeeze(-1), self.prior_logprec.squeeze(-1)
+
+
+def compile_pooling(model, dynamic=False, mode='reduce-overhead'):
+    """
+    Compile the forward of every pooling layer inside model in place with
+    torch.compile, so that Inductor fuses their chains of small elementwise
+    and reduction kernels and, with mode='reduce-overhead', replays them as
+    CUDA graphs. It is a no-op without CUDA or on torch < 2.0.
+
+    With dynamic=False the compiled graphs are specialized on the input
+    shape, so this only pays off for a fixed (B, F, T) per deployment,
+    e.g. extraction on fixed-length chunks (pad to a few buckets
+    otherwise). Call it after loading the checkpoint, and not on a model
+    that is going to be exported by torch.jit.script.
+    """
+    if not hasattr(torch, 'compile') or not torch.cuda.is_available():
+        return model
+    for module in model.modules():
+        if isinstance(module, _Pooling):
+            module.forward = torch.compile(module.forward,
+                                           dynamic=dynamic,
+                                           mode=mode)
+    return model
 
 if __name__ == '__main__':
     data = torch.randn(16, 512, 10, 35)